@@ -1,7 +1,7 @@
 # app.py
 import os
-import io
-import uuid
+import asyncio
+from contextlib import asynccontextmanager
 from typing import List
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse
@@ -10,27 +10,67 @@ from fastapi.middleware.cors import CORSMiddleware  # ✅ ADD THIS
 from dotenv import load_dotenv
 from PIL import Image
 
-from pinecone import Pinecone, ServerlessSpec
-
 from embedding_service import get_embedding_service
+from embedding_cache import get_embedding_cache
+from image_io import decode_image
+from pinecone_client import get_index
 from pipeline import get_pipeline
+from storage import get_storage
 
 load_dotenv()
 
 # --- Config ---
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX = os.getenv("PINECONE_INDEX_NAME", "museum-images")
-PINECONE_REGION = os.getenv("PINECONE_REGION", "us-east-1")
 TOP_K = int(os.getenv("TOP_K", "5"))
+# Query images are debug artifacts — only persist them when asked to
+SAVE_QUERY_IMAGES = os.getenv("SAVE_QUERY_IMAGES", "0") == "1"
 IMAGES_DIR = "images"
-MUSEUM_DIR = os.path.join(IMAGES_DIR, "museum")
-QUERIES_DIR = os.path.join(IMAGES_DIR, "queries")
+PREPROCESSED_DIR = os.path.join(IMAGES_DIR, "preprocessed")
+
+os.makedirs(PREPROCESSED_DIR, exist_ok=True)
+
+# --- Models / index handles (loaded in lifespan, not at import) ---
+embed_service = None
+pipeline = None
+embed_cache = None
+storage = None
+index = None
+EMBED_DIM = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Load models and connect to Pinecone at startup
+
+    Doing this here instead of at import keeps module import cheap and
+    gives each Uvicorn worker a well-defined init point instead of
+    loading DINOv2 + YOLO as an import side effect.
+    """
+    global embed_service, pipeline, embed_cache, storage, index, EMBED_DIM
+
+    embed_service = get_embedding_service()
+    pipeline = get_pipeline()
+    embed_cache = get_embedding_cache()
+    storage = get_storage()  # creates images/museum and images/queries
+
+    EMBED_DIM = embed_service.get_embedding_dim()
+    # Shared handle; creates the index on first use if it doesn't exist
+    index = get_index()
+
+    app.state.embed_service = embed_service
+    app.state.pipeline = pipeline
+
+    yield
+
+    # Drain in-flight background writes: /index responses have already
+    # advertised these image URLs, so the bytes must reach disk before
+    # the process exits
+    if _write_tasks:
+        await asyncio.gather(*_write_tasks, return_exceptions=True)
 
-os.makedirs(MUSEUM_DIR, exist_ok=True)
-os.makedirs(QUERIES_DIR, exist_ok=True)
 
 # --- FastAPI App ---
-app = FastAPI(title="Visual RAG Prototype - Pinecone + Local Images")
+app = FastAPI(title="Visual RAG Prototype - Pinecone + Local Images", lifespan=lifespan)
 
 # ✅ ADD CORS MIDDLEWARE - MUST BE BEFORE OTHER MIDDLEWARE
 app.add_middleware(
@@ -43,40 +83,60 @@ app.add_middleware(
 
 app.mount("/images", StaticFiles(directory=IMAGES_DIR), name="images")
 
-# --- Load Models ---
-embed_service = get_embedding_service()
-pipeline = get_pipeline()
 
-# --- Initialize Pinecone v3 ---
-if not PINECONE_API_KEY:
-    raise RuntimeError("Set PINECONE_API_KEY in .env")
+# Search results keyed by (query hash, top_k) — a repeat query returns
+# without touching the pipeline, the model, or Pinecone
+SEARCH_CACHE_MAX = 1024
+_search_cache = {}
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
+# Background disk writes: the event loop only keeps weak references to
+# tasks, so hold strong ones here until each write finishes
+_write_tasks = set()
 
-# Ensure index exists
-EMBED_DIM = embed_service.get_embedding_dim()
-existing_indexes = pc.list_indexes().names()
 
-if PINECONE_INDEX not in existing_indexes:
-    pc.create_index(
-        name=PINECONE_INDEX,
-        dimension=EMBED_DIM,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region=PINECONE_REGION)
-    )
+def _write_done(task: asyncio.Task):
+    _write_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"❌ Background write failed: {task.exception()}")
 
-index = pc.Index(PINECONE_INDEX)
 
+def write_in_background(fn, *args):
+    """Run a blocking disk write off the request path, logging failures"""
+    task = asyncio.create_task(asyncio.to_thread(fn, *args))
+    _write_tasks.add(task)
+    task.add_done_callback(_write_done)
 
-# ---------- Helpers ----------
-def save_upload_file(local_dir: str, file: UploadFile) -> str:
-    filename = f"{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
-    path = os.path.join(local_dir, filename)
-    with open(path, "wb") as f:
-        f.write(file.file.read())
 
-    rel = path.replace("\\", "/")
-    return f"/{rel}"
+def embed_with_cache(file_bytes: bytes, pil: Image.Image, apply_detection: bool = False,
+                     processed_dir: str = None) -> tuple:
+    """
+    Generate an embedding, skipping the pipeline entirely on a cache hit
+
+    Color normalization only runs when the image hasn't been embedded
+    before; the cache key includes the pipeline flags so differently
+    preprocessed embeddings never collide.
+
+    Returns:
+        Tuple of (image hash, embedding vector)
+    """
+    img_hash = embed_cache.hash_bytes(file_bytes)
+    cache_key = f"{embed_service.model_name}|det={int(apply_detection)}|norm=1"
+    vector = embed_cache.get(cache_key, img_hash)
+    if vector is None:
+        processed = pipeline.process_image(pil, apply_detection=apply_detection, apply_color_norm=True)
+        vector = embed_service.generate_embedding(processed)
+        embed_cache.put(cache_key, img_hash, vector)
+        if processed_dir:
+            # Keep the normalized image so it never has to be recomputed;
+            # the PNG encode+write happens off the request path
+            write_in_background(processed.save, os.path.join(processed_dir, f"{img_hash}.png"))
+    elif processed_dir and not os.path.exists(os.path.join(processed_dir, f"{img_hash}.png")):
+        # The cache entry may have come from /search, which doesn't
+        # persist the preprocessed image — regenerate it so the
+        # preprocessed_url in the upserted metadata actually resolves
+        processed = pipeline.process_image(pil, apply_detection=apply_detection, apply_color_norm=True)
+        write_in_background(processed.save, os.path.join(processed_dir, f"{img_hash}.png"))
+    return img_hash, vector
 
 
 # ---------- Endpoints ----------
@@ -91,33 +151,37 @@ async def index_image(
     if file.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
         raise HTTPException(status_code=400, detail="Only JPG/PNG images supported.")
 
-    try:
-        file.file.seek(0)
-        saved_url = save_upload_file(MUSEUM_DIR, file)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
+    # Read the upload once; everything downstream works from memory
+    file_bytes = await file.read()
 
     try:
-        image_path = saved_url.lstrip("/")
-        pil = Image.open(image_path).convert("RGB")
+        pil = decode_image(file_bytes)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
 
+    # Persist off the request path — the embedding doesn't need the disk copy
+    file_id = storage.make_file_id(file.filename)
+    saved_url = storage.get_image_url(file_id)
+    write_in_background(storage.write_image_bytes, file_id, file_bytes)
+
     try:
-        processed = pipeline.process_image(pil, apply_detection=False, apply_color_norm=True)
-        vector = embed_service.generate_embedding(processed)
+        img_hash, vector = embed_with_cache(file_bytes, pil, processed_dir=PREPROCESSED_DIR)
 
-        item_id = os.path.basename(image_path)
+        item_id = file_id
         metadata = {
             "title": title,
             "artist": artist,
             "year": year,
             "category": category,
-            "image_url": saved_url
+            "image_url": saved_url,
+            "preprocessed_url": f"/images/preprocessed/{img_hash}.png"
         }
 
         index.upsert(vectors=[{"id": item_id, "values": vector, "metadata": metadata}])
 
+        # The index changed — cached search results are now stale
+        _search_cache.clear()
+
         return JSONResponse({"status": "ok", "id": item_id, "metadata": metadata})
 
     except Exception as e:
@@ -129,17 +193,23 @@ async def search_image(file: UploadFile = File(...), top_k: int = Form(TOP_K)):
     if file.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
         raise HTTPException(status_code=400, detail="Only JPG/PNG images supported.")
 
+    file_bytes = await file.read()
+
     try:
-        file.file.seek(0)
-        saved_url = save_upload_file(QUERIES_DIR, file)
-        image_path = saved_url.lstrip("/")
-        pil = Image.open(image_path).convert("RGB")
+        pil = decode_image(file_bytes)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid query image: {e}")
 
+    if SAVE_QUERY_IMAGES:
+        write_in_background(storage.save_query_image, file_bytes, file.filename)
+
     try:
-        processed = pipeline.process_image(pil, apply_detection=False, apply_color_norm=True)
-        q_vector = embed_service.generate_embedding(processed)
+        img_hash, q_vector = embed_with_cache(file_bytes, pil)
+
+        # Identical query submitted before? Return the cached results.
+        cache_key = (img_hash, top_k)
+        if cache_key in _search_cache:
+            return {"matches": _search_cache[cache_key]}
 
         resp = index.query(vector=q_vector, top_k=top_k, include_metadata=True)
 
@@ -153,6 +223,10 @@ async def search_image(file: UploadFile = File(...), top_k: int = Form(TOP_K)):
                 "image_url": md.get("image_url", "")
             })
 
+        if len(_search_cache) >= SEARCH_CACHE_MAX:
+            _search_cache.pop(next(iter(_search_cache)))
+        _search_cache[cache_key] = matches
+
         return {"matches": matches}
 
     except Exception as e:
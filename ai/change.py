@@ -1,37 +1,52 @@
-from PIL import Image, UnidentifiedImageError, ImageFile
+from PIL import UnidentifiedImageError, ImageFile
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+from image_io import open_image
 
 ImageFile.LOAD_TRUNCATED_IMAGES = True   # Allow loading broken images
 
 input_folder = "E:/Realmeta/ai/museum/resized/resized"
 output_folder = "E:/Realmeta/ai/converted_images"
+supported_exts = frozenset({".jpg", ".jpeg", ".png"})
 os.makedirs(output_folder, exist_ok=True)
 
-count = 0
-for file in os.listdir(input_folder):
+
+def clean_one(file):
+    """Clean a single image. Returns True if it was converted."""
     path = os.path.join(input_folder, file)
-    ext = os.path.splitext(file)[1].lower()
-    
-    if ext not in [".jpg", ".jpeg", ".png"]:
-        continue
 
     try:
-        img = Image.open(path)
-        img = img.convert("RGB")  # Force RGB
+        img = open_image(path)  # RGB, turbo-decoded when available
 
         # Skip very small files (<10KB)
         if os.path.getsize(path) < 10 * 1024:
             print(f"⚠️ Too small, skipped: {file}")
-            continue
+            return False
 
         # Save as clean baseline JPEG
         clean_name = os.path.splitext(file)[0] + ".jpg"
         img.save(os.path.join(output_folder, clean_name), "JPEG", quality=90, optimize=True, progressive=False)
 
         print(f"✅ Cleaned: {file}")
-        count += 1
+        return True
 
     except UnidentifiedImageError:
         print(f"❌ Corrupt/Unsupported: {file}")
+        return False
+
+
+if __name__ == "__main__":
+    # Lazy directory scan with the extension filter applied up front
+    with os.scandir(input_folder) as it:
+        files = [
+            e.name for e in it
+            if e.is_file() and os.path.splitext(e.name)[1].lower() in supported_exts
+        ]
+
+    # JPEG decode+encode is CPU-bound and per-file independent,
+    # so spread it across one worker per core
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(clean_one, files, chunksize=16))
 
-print(f"\nDone. Cleaned images: {count}")
+    print(f"\nDone. Cleaned images: {sum(results)}")
@@ -0,0 +1,112 @@
+"""
+Embedding Cache Module
+Content-hash cache so identical image bytes are never re-embedded
+"""
+
+import sqlite3
+import hashlib
+import time
+import numpy as np
+from typing import List, Optional
+
+
+class EmbeddingCache:
+    """SQLite-backed cache mapping (model, sha256 of image bytes) -> vector"""
+
+    def __init__(self, db_path: str = "embed_cache.sqlite", max_entries: int = 50000):
+        """
+        Initialize the cache
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_entries: Cap on stored vectors; least-recently-used rows
+                are evicted once the cap is exceeded
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                vec BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        """SHA-256 hex digest of raw image bytes"""
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, model: str, img_hash: str) -> Optional[List[float]]:
+        """
+        Look up a cached embedding
+
+        Args:
+            model: Model name used to generate the embedding
+            img_hash: SHA-256 of the image bytes
+
+        Returns:
+            Embedding vector as list, or None on cache miss
+        """
+        row = self.conn.execute(
+            "SELECT vec FROM embeddings WHERE model = ? AND hash = ?",
+            (model, img_hash),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        self.conn.execute(
+            "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+            (time.time(), model, img_hash),
+        )
+        self.conn.commit()
+
+        # Vectors are stored as raw float32 bytes to avoid JSON overhead
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def put(self, model: str, img_hash: str, vector: List[float]):
+        """
+        Store an embedding, evicting least-recently-used entries if full
+
+        Args:
+            model: Model name used to generate the embedding
+            img_hash: SHA-256 of the image bytes
+            vector: Embedding vector
+        """
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO embeddings (model, hash, vec, last_used) VALUES (?, ?, ?, ?)",
+            (model, img_hash, blob, time.time()),
+        )
+
+        # LRU eviction beyond the cap
+        count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                """
+                DELETE FROM embeddings WHERE (model, hash) IN (
+                    SELECT model, hash FROM embeddings
+                    ORDER BY last_used ASC LIMIT ?
+                )
+                """,
+                (count - self.max_entries,),
+            )
+        self.conn.commit()
+
+
+# Global instance (lazy loading)
+_embedding_cache = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get or create global embedding cache instance"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
@@ -0,0 +1,50 @@
+"""
+Image Decoding Module
+JPEG decode via libjpeg-turbo (PyTurboJPEG) when available, Pillow otherwise
+"""
+
+import io
+from PIL import Image
+
+# PyTurboJPEG is optional: its SIMD IDCT/colorspace paths decode JPEGs
+# 4-6x faster than stock libjpeg, but everything works without it
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _turbo = TurboJPEG()
+except Exception:
+    _turbo = None
+
+JPEG_MAGIC = b"\xff\xd8"
+
+
+def decode_image(data: bytes) -> Image.Image:
+    """
+    Decode image bytes into an RGB PIL Image
+
+    Args:
+        data: Raw image file bytes (JPEG or PNG)
+
+    Returns:
+        PIL Image in RGB format
+    """
+    if _turbo is not None and data[:2] == JPEG_MAGIC:
+        try:
+            return Image.fromarray(_turbo.decode(data, pixel_format=TJPF_RGB))
+        except Exception:
+            pass  # fall back to Pillow on JPEGs turbojpeg can't handle
+
+    return Image.open(io.BytesIO(data)).convert("RGB")
+
+
+def open_image(path: str) -> Image.Image:
+    """
+    Read and decode an image file into an RGB PIL Image
+
+    Args:
+        path: Path to the image file
+
+    Returns:
+        PIL Image in RGB format
+    """
+    with open(path, "rb") as f:
+        return decode_image(f.read())
@@ -1,61 +1,136 @@
 import os
-import uuid
-from PIL import Image
-from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
-
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from embedding_service import get_embedding_service
+from embedding_cache import get_embedding_cache
+from image_io import decode_image
+from pinecone_client import get_index
 from pipeline import get_pipeline  # your ImagePipeline
 
-load_dotenv()
-
 # ---- Config ----
 FOLDER = "converted_images"  # the folder that contains your images
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX = os.getenv("PINECONE_INDEX_NAME", "museum-images")
-PINECONE_REGION = os.getenv("PINECONE_REGION", "us-east-1")
+UPSERT_BATCH_SIZE = 100      # vectors per upsert request
+EMBED_BATCH_SIZE = 32        # images per model forward pass
+READ_WORKERS = 32            # concurrent file reads
+SUPPORTED_EXTS = frozenset({".jpg", ".jpeg", ".png"})
 
 # ---- Init ----
-pc = Pinecone(api_key=PINECONE_API_KEY)
 embed_service = get_embedding_service()
+embed_cache = get_embedding_cache()
 pipeline = get_pipeline()
 
-EMBED_DIM = embed_service.get_embedding_dim()
-if PINECONE_INDEX not in pc.list_indexes().names():
-    pc.create_index(
-        name=PINECONE_INDEX,
-        dimension=EMBED_DIM,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region=PINECONE_REGION)
-    )
+# Shared handle, already configured with a parallel-upsert thread pool
+index = get_index()
+
+
+def chunks(iterable, batch_size=UPSERT_BATCH_SIZE):
+    """Yield successive batch_size-sized chunks from an iterable"""
+    it = iter(iterable)
+    chunk = list(itertools.islice(it, batch_size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(it, batch_size))
 
-index = pc.Index(PINECONE_INDEX)
 
+def read_file(path):
+    """Read a file fully into memory"""
+    with open(path, "rb") as f:
+        return f.read()
 
-def index_folder(folder_path):
-    files = os.listdir(folder_path)
-    supported = [f for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+
+def index_folder(folder_path, default_metadata=None):
+    # scandir streams entries lazily instead of materializing the whole
+    # listing, and the set lookup avoids a tuple scan per filename
+    with os.scandir(folder_path) as it:
+        supported = [
+            e.name for e in it
+            if e.is_file() and os.path.splitext(e.name)[1].lower() in SUPPORTED_EXTS
+        ]
 
     print(f"Found {len(supported)} images to index.")
 
-    for filename in supported:
-        img_path = os.path.join(folder_path, filename)
-        try:
-            pil = Image.open(img_path).convert("RGB")
-            processed = pipeline.process_image(pil, apply_detection=True, apply_color_norm=True)
-            vector = embed_service.generate_embedding(processed)
+    # Cache key includes the pipeline flags used below so these
+    # embeddings never collide with differently preprocessed ones
+    cache_key = f"{embed_service.model_name}|det=1|norm=1"
+
+    vectors = []
+    cached_hits = 0
+
+    def add_vector(filename, img_hash, vector):
+        # Content-derived ID: the same bytes always map to the same
+        # Pinecone record, so re-runs overwrite instead of duplicating
+        item_id = f"{img_hash}_{filename}"
+        metadata = {
+            "title": "", "artist": "", "year": "", "category": "",
+            **(default_metadata or {}),
+            "image_url": f"/images/museum/{item_id}"
+        }
+        vectors.append({"id": item_id, "values": vector, "metadata": metadata})
+
+    # Read each batch's files concurrently so the disk sees many
+    # outstanding requests instead of one blocking read at a time
+    reader = ThreadPoolExecutor(max_workers=READ_WORKERS)
+
+    for batch_files in chunks(supported, EMBED_BATCH_SIZE):
+        # Load the batch (skip files that fail to load, and serve
+        # repeats straight from the embedding cache)
+        read_futures = [
+            reader.submit(read_file, os.path.join(folder_path, f))
+            for f in batch_files
+        ]
+
+        batch_imgs = []
+        processed_names = []
+        processed_hashes = []
+        for filename, future in zip(batch_files, read_futures):
+            try:
+                file_bytes = future.result()
+
+                img_hash = embed_cache.hash_bytes(file_bytes)
+                cached = embed_cache.get(cache_key, img_hash)
+                if cached is not None:
+                    # Embedded before — skip the expensive model pass but
+                    # still upsert: the cache may have been filled by a run
+                    # that was interrupted before its upserts went out, and
+                    # content-derived IDs make re-upserting idempotent
+                    cached_hits += 1
+                    add_vector(filename, img_hash, cached)
+                    print(f"♻️ Cached: {filename}")
+                    continue
+
+                batch_imgs.append(decode_image(file_bytes))
+                processed_names.append(filename)
+                processed_hashes.append(img_hash)
+            except Exception as e:
+                print(f"❌ Failed for {filename}: {e}")
+
+        if not batch_imgs:
+            continue
+
+        # Detection + color normalization with one YOLO call per batch
+        processed_imgs = pipeline.process_images(batch_imgs, apply_detection=True, apply_color_norm=True)
+
+        # One forward pass for the whole batch instead of one per image
+        embeddings = embed_service.generate_embeddings_batch(processed_imgs)
+
+        for filename, img_hash, vector in zip(processed_names, processed_hashes, embeddings):
+            vector = vector.tolist()
+            embed_cache.put(cache_key, img_hash, vector)
+            add_vector(filename, img_hash, vector)
+            print(f"✅ Embedded: {filename}")
 
-            item_id = f"{uuid.uuid4().hex}_{filename}"
-            metadata = {
-                "title": "", "artist": "", "year": "", "category": "",
-                "image_url": f"/images/museum/{item_id}"
-            }
+    reader.shutdown()
 
-            index.upsert(vectors=[{"id": item_id, "values": vector, "metadata": metadata}])
-            print(f"✅ Indexed: {filename}")
+    # Batch upserts: one request per chunk instead of one per image,
+    # and all chunks in flight at once via the index's thread pool.
+    async_results = [
+        index.upsert(vectors=chunk, async_req=True)
+        for chunk in chunks(vectors)
+    ]
+    for result in async_results:
+        result.get()  # wait for completion, raises on failure
 
-        except Exception as e:
-            print(f"❌ Failed for {filename}: {e}")
+    print(f"⬆️ Upserted {len(vectors)} vectors in {len(async_results)} batches ({cached_hits} from cache).")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+"""
+Pinecone Client Module
+Shared index handle for the API and the batch scripts
+"""
+
+import os
+import functools
+from dotenv import load_dotenv
+from pinecone import Pinecone, ServerlessSpec
+
+from embedding_service import get_embedding_service
+
+load_dotenv()
+
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+PINECONE_INDEX = os.getenv("PINECONE_INDEX_NAME", "museum-images")
+PINECONE_REGION = os.getenv("PINECONE_REGION", "us-east-1")
+POOL_THREADS = 30  # parallel upsert connections
+
+
+@functools.lru_cache(maxsize=None)
+def get_pinecone() -> Pinecone:
+    """Get or create the shared Pinecone client"""
+    if not PINECONE_API_KEY:
+        raise RuntimeError("Set PINECONE_API_KEY in .env")
+    return Pinecone(api_key=PINECONE_API_KEY)
+
+
+@functools.lru_cache(maxsize=None)
+def get_index():
+    """
+    Get or create the shared index handle
+
+    The index-existence check hits the control plane only once per
+    process, and the handle comes with a thread pool ready for
+    parallel upserts.
+
+    Returns:
+        Pinecone Index handle
+    """
+    pc = get_pinecone()
+
+    if PINECONE_INDEX not in pc.list_indexes().names():
+        pc.create_index(
+            name=PINECONE_INDEX,
+            dimension=get_embedding_service().get_embedding_dim(),
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region=PINECONE_REGION)
+        )
+
+    return pc.Index(PINECONE_INDEX, pool_threads=POOL_THREADS)
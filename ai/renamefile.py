@@ -1,10 +1,13 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 folder = r"E:\Realmeta\ai\museum\resized\resized"
 prefix = "art"
 files = os.listdir(folder)
 
-for i, filename in enumerate(files, start=1):
+
+def rename_one(args):
+    i, filename = args
     old_path = os.path.join(folder, filename)
     ext = os.path.splitext(filename)[1]
     new_name = f"{prefix}_{i}{ext}"
@@ -12,4 +15,9 @@ for i, filename in enumerate(files, start=1):
 
     os.rename(old_path, new_path)
 
+
+# Renames are I/O-bound syscalls — run them on a thread pool
+with ThreadPoolExecutor(max_workers=16) as executor:
+    list(executor.map(rename_one, enumerate(files, start=1)))
+
 print("✅ Files renamed with prefix!")
@@ -30,39 +30,55 @@ class LocalStorage:
         
         print(f"Storage initialized at: {self.base_dir.absolute()}")
     
+    def make_file_id(self, filename: Optional[str] = None, format: str = "JPEG") -> str:
+        """
+        Generate a unique file ID, keeping the original name and extension
+
+        Args:
+            filename: Original filename (optional, will generate UUID if None)
+            format: Image format used for the extension when filename is None
+
+        Returns:
+            Unique file ID
+        """
+        if filename:
+            # Sanitize filename and keep extension
+            ext = Path(filename).suffix or f".{format.lower()}"
+            base_name = Path(filename).stem
+            return f"{base_name}_{uuid.uuid4().hex[:8]}{ext}"
+        return f"{uuid.uuid4().hex}.{format.lower()}"
+
+    def write_image_bytes(self, file_id: str, image_bytes: bytes, image_type: str = "museum"):
+        """
+        Write image bytes for an already-generated file ID
+
+        Args:
+            file_id: Image file ID
+            image_bytes: Image data as bytes
+            image_type: Either 'museum' or 'query'
+        """
+        self.get_image_path(file_id, image_type).write_bytes(image_bytes)
+
     def save_museum_image(
-        self, 
-        image_bytes: bytes, 
+        self,
+        image_bytes: bytes,
         filename: Optional[str] = None,
         format: str = "JPEG"
     ) -> tuple[str, str]:
         """
         Save museum image to local storage
-        
+
         Args:
             image_bytes: Image data as bytes
             filename: Original filename (optional, will generate UUID if None)
             format: Image format (JPEG, PNG, etc.)
-            
+
         Returns:
             Tuple of (file_id, file_path)
         """
-        # Generate unique filename
-        if filename:
-            # Sanitize filename and keep extension
-            ext = Path(filename).suffix or f".{format.lower()}"
-            base_name = Path(filename).stem
-            file_id = f"{base_name}_{uuid.uuid4().hex[:8]}{ext}"
-        else:
-            file_id = f"{uuid.uuid4().hex}.{format.lower()}"
-        
-        file_path = self.museum_dir / file_id
-        
-        # Save file
-        with open(file_path, 'wb') as f:
-            f.write(image_bytes)
-        
-        return file_id, str(file_path)
+        file_id = self.make_file_id(filename, format)
+        self.write_image_bytes(file_id, image_bytes, "museum")
+        return file_id, str(self.museum_dir / file_id)
     
     def save_query_image(
         self, 
@@ -80,17 +96,13 @@ class LocalStorage:
             Tuple of (file_id, file_path)
         """
         if filename:
-            ext = Path(filename).suffix or ".jpg"
             file_id = f"{uuid.uuid4().hex[:8]}_{Path(filename).name}"
         else:
             file_id = f"{uuid.uuid4().hex}.jpg"
-        
-        file_path = self.query_dir / file_id
-        
-        with open(file_path, 'wb') as f:
-            f.write(image_bytes)
-        
-        return file_id, str(file_path)
+
+        self.write_image_bytes(file_id, image_bytes, "query")
+
+        return file_id, str(self.query_dir / file_id)
     
     def get_image_url(self, file_id: str, image_type: str = "museum") -> str:
         """